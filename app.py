@@ -1,13 +1,14 @@
 import json
 import re
-from math import asin, atan2, cos, degrees, radians, sin
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import shapely
 import streamlit as st
 from shapely.geometry import shape
-from shapely.ops import unary_union
+from shapely.geometry.base import BaseGeometry
 
 
 st.set_page_config(
@@ -24,14 +25,64 @@ NETWORK_LAYER_DIR = Path("coverage_layers")
 MAP_CENTER = {"lat": 33.7490, "lon": -84.3880}
 EARTH_RADIUS_MI = 3958.7613
 CIRCLE_STEPS = 48
+COVERAGE_DISTANCES = [round(0.1 * step, 1) for step in range(1, 11)]
+# ~10 m at Atlanta's latitude; 6 decimal places is ~0.1 m.
+MASK_SIMPLIFY_TOLERANCE = 1e-4
+GEOJSON_COORD_PRECISION = 6
+SEARCH_FIELD_SEPARATOR = "\x1f"
+# Above this many markers, let mapbox-gl cluster points until street zoom.
+CLUSTER_MIN_POINTS = 1000
+CLUSTER_MAX_ZOOM = 14
+CATEGORY_COLUMNS = ("council_district", "npu", "license_classification", "naics_name")
+SORT_COLUMNS = [
+    "company_name",
+    "company_dba",
+    "council_district",
+    "npu",
+    "naics_name",
+]
+# Disjoint-subset union unions each cluster of overlapping circles
+# independently. It needs shapely >= 2.1 built against GEOS >= 3.12; otherwise
+# fall back to a plain union.
+union_circles = (
+    shapely.disjoint_subset_union_all
+    if shapely.geos_version >= (3, 12, 0)
+    and hasattr(shapely, "disjoint_subset_union_all")
+    else shapely.union_all
+)
 
 
 @st.cache_data(show_spinner=False)
 def load_data(path: Path) -> pd.DataFrame:
-    df = pd.read_csv(path)
+    df = pd.read_csv(path, engine="pyarrow")
     df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
     df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
-    return df.dropna(subset=["latitude", "longitude"]).copy()
+    df = df.dropna(subset=["latitude", "longitude"]).copy()
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype("category")
+    df["_disinvested_bool"] = normalize_bool_series(df["disinvested_neighborhood"])
+    df["_search_blob"] = (
+        df["company_name"].fillna("")
+        + SEARCH_FIELD_SEPARATOR
+        + df["company_dba"].fillna("")
+        + SEARCH_FIELD_SEPARATOR
+        + df["address_api"].fillna("")
+    ).astype("string[pyarrow]").str.lower()
+    return df
+
+
+@st.cache_data(show_spinner=False)
+def load_sort_orders(path: Path):
+    # Row positions of load_data(path) in table order for every sort option,
+    # so reruns gather the filtered rows instead of re-sorting them.
+    df = load_data(path).reset_index(drop=True)
+    return {
+        (col, ascending): df.sort_values(
+            col, ascending=ascending, kind="stable"
+        ).index.to_numpy()
+        for col in SORT_COLUMNS
+        for ascending in (True, False)
+    }
 
 
 @st.cache_data(show_spinner=False)
@@ -63,38 +114,50 @@ def extract_geometry(geojson_obj):
     return shape(geojson_obj)
 
 
+@st.cache_resource(show_spinner=False)
+def load_boundary_shape(path: Path, mtime: float) -> BaseGeometry:
+    with path.open() as f:
+        boundary_geom = extract_geometry(json.load(f))
+    shapely.prepare(boundary_geom)
+    return boundary_geom
+
+
 def normalize_bool_series(series: pd.Series) -> pd.Series:
     return (
-        series.astype(str)
+        series.astype("string")
         .str.strip()
         .str.lower()
         .map({"true": True, "false": False, "1": True, "0": False})
+        .astype("boolean")
     )
 
 
-def destination_point(lat, lon, bearing_deg, distance_mi):
-    angular_distance = distance_mi / EARTH_RADIUS_MI
-    lat1 = radians(lat)
-    lon1 = radians(lon)
-    bearing = radians(bearing_deg)
+def build_circle_rings(lats, lons, radius_mi):
+    angular_distance = radius_mi / EARTH_RADIUS_MI
+    lat1 = np.radians(np.asarray(lats, dtype=float))[:, None]
+    lon1 = np.radians(np.asarray(lons, dtype=float))[:, None]
+    bearings = np.linspace(0, 2 * np.pi, CIRCLE_STEPS, endpoint=False)
 
-    lat2 = asin(
-        sin(lat1) * cos(angular_distance)
-        + cos(lat1) * sin(angular_distance) * cos(bearing)
+    lat2 = np.arcsin(
+        np.sin(lat1) * np.cos(angular_distance)
+        + np.cos(lat1) * np.sin(angular_distance) * np.cos(bearings)
     )
-    lon2 = lon1 + atan2(
-        sin(bearing) * sin(angular_distance) * cos(lat1),
-        cos(angular_distance) - sin(lat1) * sin(lat2),
+    lon2 = lon1 + np.arctan2(
+        np.sin(bearings) * np.sin(angular_distance) * np.cos(lat1),
+        np.cos(angular_distance) - np.sin(lat1) * np.sin(lat2),
     )
-    return [degrees(lon2), degrees(lat2)]
+    rings = np.stack([np.degrees(lon2), np.degrees(lat2)], axis=-1)
+    return np.concatenate([rings, rings[:, :1]], axis=1)
 
 
-def build_circle_feature(lat, lon, radius_mi):
-    ring = [
-        destination_point(lat, lon, (360 * step) / CIRCLE_STEPS, radius_mi)
-        for step in range(CIRCLE_STEPS)
-    ]
-    ring.append(ring[0])
+def geometry_to_geojson(geom):
+    geom = shapely.transform(
+        geom, lambda coords: np.round(coords, GEOJSON_COORD_PRECISION)
+    )
+    return json.loads(shapely.to_geojson(geom))
+
+
+def build_circle_feature(ring, radius_mi):
     return {
         "type": "Feature",
         "properties": {"radius_miles": radius_mi},
@@ -102,32 +165,56 @@ def build_circle_feature(lat, lon, radius_mi):
     }
 
 
-@st.cache_data(show_spinner=False)
-def build_coverage_layers(boundary_geojson, points_records, radius_miles):
-    boundary_geom = extract_geometry(boundary_geojson)
-    circle_features = []
-    circle_geoms = []
-
-    for record in points_records:
-        circle_feature = build_circle_feature(
-            record["latitude"], record["longitude"], radius_miles
+def pack_coordinates(frame: pd.DataFrame) -> bytes:
+    # Sorted float32 bytes hash far faster than a list of dicts and give the
+    # same cache key for the same provider set regardless of row order.
+    coords = frame[["latitude", "longitude"]].to_numpy(dtype=np.float32)
+    coords = coords[np.lexsort((coords[:, 1], coords[:, 0]))]
+    return coords.tobytes()
+
+
+@st.cache_resource(show_spinner=False)
+def load_full_coverage_layers(data_path: Path, boundary_path: Path, boundary_mtime: float):
+    # Layers for the unfiltered provider set at every slider distance, shared
+    # across sessions and returned without the copy st.cache_data makes.
+    coords_bytes = pack_coordinates(load_data(data_path))
+    return {
+        distance: build_coverage_layers(
+            boundary_path, boundary_mtime, coords_bytes, distance
         )
-        circle_features.append(circle_feature)
-        circle_geoms.append(shape(circle_feature["geometry"]))
+        for distance in COVERAGE_DISTANCES
+    }
 
-    coverage_geom = unary_union(circle_geoms) if circle_geoms else None
+
+@st.cache_data(show_spinner=False)
+def build_coverage_layers(
+    boundary_path: Path, boundary_mtime: float, coords_bytes: bytes, radius_miles: float
+):
+    boundary_geom = load_boundary_shape(boundary_path, boundary_mtime)
+    coords = np.frombuffer(coords_bytes, dtype=np.float32).reshape(-1, 2)
+    rings = build_circle_rings(coords[:, 0], coords[:, 1], radius_miles)
+    circle_features = [
+        build_circle_feature(ring, radius_miles)
+        for ring in np.round(rings, GEOJSON_COORD_PRECISION).tolist()
+    ]
+    circle_geoms = shapely.polygons(rings)
+
+    coverage_geom = union_circles(circle_geoms) if len(circle_geoms) else None
     uncovered_geom = (
         boundary_geom.difference(coverage_geom)
         if coverage_geom is not None
         else boundary_geom
     )
+    uncovered_geom = uncovered_geom.simplify(
+        MASK_SIMPLIFY_TOLERANCE, preserve_topology=True
+    )
 
     return {
         "circle_outlines": {
             "type": "FeatureCollection",
             "features": circle_features,
         },
-        "uncovered_mask": json.loads(json.dumps(uncovered_geom.__geo_interface__)),
+        "uncovered_mask": geometry_to_geojson(uncovered_geom),
     }
 
 
@@ -142,6 +229,7 @@ if not CSV_PATH.exists() and not FALLBACK_CSV_PATH.exists():
 
 data_path = CSV_PATH if CSV_PATH.exists() else FALLBACK_CSV_PATH
 df = load_data(data_path)
+sort_orders = load_sort_orders(data_path)
 atlanta_boundary = load_boundary(BOUNDARY_PATH) if BOUNDARY_PATH.exists() else None
 marta_routes = load_boundary(MARTA_ROUTES_PATH) if MARTA_ROUTES_PATH.exists() else None
 walk_uncovered_layers = load_network_uncovered_layers("walk")
@@ -152,7 +240,11 @@ with st.sidebar:
     search_text = st.text_input("Search company/DBA", "")
 
     coverage_distance_miles = st.slider(
-        "Coverage distance (miles)", min_value=0.1, max_value=1.0, value=0.5, step=0.1
+        "Coverage distance (miles)",
+        min_value=COVERAGE_DISTANCES[0],
+        max_value=COVERAGE_DISTANCES[-1],
+        value=0.5,
+        step=0.1,
     )
     coverage_options = ["Euclidean"]
     if walk_uncovered_layers:
@@ -169,7 +261,6 @@ with st.sidebar:
     npu_values = sorted(df["npu"].dropna().unique().tolist())
     selected_npus = st.multiselect("NPU", npu_values, default=npu_values)
 
-    disinvested_series = normalize_bool_series(df["disinvested_neighborhood"])
     disinvested_options = ["All", "Disinvested only", "Not disinvested only"]
     disinvested_filter = st.selectbox(
         "Disinvested neighborhood", disinvested_options, index=0
@@ -183,23 +274,18 @@ with st.sidebar:
         disabled=marta_routes is None,
     )
 
-filtered = df.copy()
-filtered = filtered[filtered["council_district"].isin(selected_districts)]
-filtered = filtered[filtered["npu"].isin(selected_npus)]
+mask = df["council_district"].isin(selected_districts) & df["npu"].isin(selected_npus)
 
 if disinvested_filter == "Disinvested only":
-    filtered = filtered[disinvested_series.reindex(filtered.index) == True]
+    mask &= df["_disinvested_bool"].fillna(False)
 elif disinvested_filter == "Not disinvested only":
-    filtered = filtered[disinvested_series.reindex(filtered.index) == False]
+    mask &= (~df["_disinvested_bool"]).fillna(False)
 
 if search_text:
     pattern = search_text.strip().lower()
-    mask = (
-        filtered["company_name"].fillna("").str.lower().str.contains(pattern)
-        | filtered["company_dba"].fillna("").str.lower().str.contains(pattern)
-        | filtered["address_api"].fillna("").str.lower().str.contains(pattern)
-    )
-    filtered = filtered[mask]
+    mask &= df["_search_blob"].str.contains(pattern, regex=False)
+
+filtered = df.loc[mask]
 
 st.subheader("Map")
 st.write(f"Showing **{len(filtered):,}** of **{len(df):,}** providers.")
@@ -216,11 +302,18 @@ if (
     and atlanta_boundary is not None
     and coverage_mode == "Euclidean"
 ):
-    coverage_layers = build_coverage_layers(
-        atlanta_boundary,
-        filtered[["latitude", "longitude"]].to_dict("records"),
-        selected_distance,
-    )
+    boundary_mtime = BOUNDARY_PATH.stat().st_mtime
+    if len(filtered) == len(df):
+        coverage_layers = load_full_coverage_layers(
+            data_path, BOUNDARY_PATH, boundary_mtime
+        )[selected_distance]
+    else:
+        coverage_layers = build_coverage_layers(
+            BOUNDARY_PATH,
+            boundary_mtime,
+            pack_coordinates(filtered),
+            selected_distance,
+        )
     st.caption(
         f"Shaded Atlanta areas fall outside the current {selected_distance:.1f}-mile provider coverage circles."
     )
@@ -237,12 +330,29 @@ if show_marta_routes and marta_routes is not None:
         "MARTA route lines are shown as a transit-access overlay. They are a useful proxy, not a full food-desert measure by themselves."
     )
 
+# One trace per council district lets the legend toggle districts
+# client-side; fixed category order keeps each district's colour stable.
+# Large sets are drawn as a single clustered trace instead, since mapbox-gl
+# clusters each trace separately and per-district bubbles would overlap.
+cluster_markers = len(filtered) > CLUSTER_MIN_POINTS
+district_colors = (
+    {}
+    if cluster_markers
+    else {
+        "color": "council_district",
+        "category_orders": {"council_district": district_values},
+        "color_discrete_sequence": px.colors.qualitative.Alphabet,
+    }
+)
 fig = px.scatter_mapbox(
     filtered,
     lat="latitude",
     lon="longitude",
+    **district_colors,
+    labels={"council_district": "Council district"},
     hover_name="company_name",
     hover_data={
+        "council_district": True,
         "company_dba": True,
         "license_classification": True,
         "naics_name": True,
@@ -318,6 +428,8 @@ if atlanta_boundary is not None:
 if map_layers:
     fig.update_layout(mapbox_layers=map_layers)
 fig.update_traces(marker={"size": marker_size, "opacity": 0.75})
+if cluster_markers:
+    fig.update_traces(cluster={"enabled": True, "maxzoom": CLUSTER_MAX_ZOOM})
 st.plotly_chart(
     fig,
     width="stretch",
@@ -325,14 +437,7 @@ st.plotly_chart(
 )
 
 st.subheader("Provider table")
-sort_columns = [
-    "company_name",
-    "company_dba",
-    "council_district",
-    "npu",
-    "naics_name",
-]
-sort_col = st.selectbox("Sort by", sort_columns, index=0)
+sort_col = st.selectbox("Sort by", SORT_COLUMNS, index=0)
 sort_ascending = st.checkbox("Ascending", value=True)
 display_cols = [
     "license_number",
@@ -347,5 +452,7 @@ display_cols = [
     "latitude",
     "longitude",
 ]
-table = filtered.sort_values(by=sort_col, ascending=sort_ascending)[display_cols]
+table_order = sort_orders[(sort_col, sort_ascending)]
+table_order = table_order[mask.to_numpy(dtype=bool)[table_order]]
+table = df.iloc[table_order][display_cols]
 st.dataframe(table, width="stretch", hide_index=True)
@@ -1,11 +1,16 @@
 import argparse
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import geopandas as gpd
 import networkx as nx
+import numpy as np
 import osmnx as ox
 import pandas as pd
+import shapely
+from pyproj import Transformer
 from shapely.geometry import shape
 from shapely.ops import unary_union
 
@@ -18,6 +23,9 @@ NETWORK_CONFIG = {
     "walk": {"edge_buffer_m": 60, "node_buffer_m": 40},
     "drive": {"edge_buffer_m": 90, "node_buffer_m": 60},
 }
+# Per-process graph and boundary state, set once per worker by init_worker so
+# the graph is not re-pickled for every distance task.
+WORKER_STATE = {}
 
 
 def parse_args():
@@ -72,6 +80,12 @@ def parse_args():
         default="walk,drive",
         help="Comma-separated network modes to compute: walk, drive.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes for computing distances in parallel (1 disables).",
+    )
     return parser.parse_args()
 
 
@@ -97,36 +111,89 @@ def load_provider_points(path: Path):
     )
 
 
-def build_service_area(graph_proj, origin_nodes, distance_m, edge_buffer_m, node_buffer_m):
+def graph_geometry_arrays(graph_proj):
+    nodes_gdf, edges_gdf = ox.graph_to_gdfs(
+        graph_proj, nodes=True, edges=True, fill_edge_geometry=True
+    )
+    node_pos = pd.Series(np.arange(len(nodes_gdf)), index=nodes_gdf.index)
+    edge_coords, edge_idx = shapely.get_coordinates(
+        edges_gdf.geometry.values, return_index=True
+    )
+    return {
+        "node_pos": node_pos,
+        "node_coords": shapely.get_coordinates(nodes_gdf.geometry.values),
+        "edge_u": node_pos.loc[edges_gdf.index.get_level_values("u")].to_numpy(),
+        "edge_v": node_pos.loc[edges_gdf.index.get_level_values("v")].to_numpy(),
+        "edge_coords": edge_coords,
+        "edge_coord_idx": edge_idx,
+    }
+
+
+def buffered_hull(coords, buffer_m):
+    if not len(coords):
+        return None
+    hull = shapely.convex_hull(shapely.multipoints(coords))
+    return shapely.buffer(hull, buffer_m, quad_segs=16)
+
+
+def build_service_area(
+    graph_proj, arrays, origin_nodes, distance_m, edge_buffer_m, node_buffer_m, label
+):
+    # Each origin contributes the convex hull of its buffered ego graph. The
+    # hull of a buffer equals the buffer of the hull, so the hull is taken from
+    # the raw reachable coordinates and only the hull is buffered.
+    unique_origins = sorted(set(origin_nodes))
     coverage_polygons = []
 
-    for idx, node_id in enumerate(sorted(set(origin_nodes)), start=1):
-        subgraph = nx.ego_graph(
-            graph_proj, node_id, radius=distance_m, distance="length"
+    for idx, node_id in enumerate(unique_origins, start=1):
+        lengths = nx.single_source_dijkstra_path_length(
+            graph_proj, node_id, cutoff=distance_m, weight="length"
         )
-        geoms = []
-        if subgraph.number_of_nodes() > 0:
-            nodes_gdf = ox.graph_to_gdfs(subgraph, nodes=True, edges=False)
-            if not nodes_gdf.empty:
-                geoms.extend(nodes_gdf.geometry.buffer(node_buffer_m).tolist())
-        if subgraph.number_of_edges() > 0:
-            edges_gdf = ox.graph_to_gdfs(
-                subgraph, nodes=False, edges=True, fill_edge_geometry=True
+        reached = np.zeros(len(arrays["node_pos"]), dtype=bool)
+        reached[arrays["node_pos"].loc[list(lengths)].to_numpy()] = True
+        edge_mask = reached[arrays["edge_u"]] & reached[arrays["edge_v"]]
+
+        parts = [
+            buffered_hull(arrays["node_coords"][reached], node_buffer_m),
+            buffered_hull(
+                arrays["edge_coords"][edge_mask[arrays["edge_coord_idx"]]],
+                edge_buffer_m,
+            ),
+        ]
+        parts = [part for part in parts if part is not None]
+        if parts:
+            coverage_polygons.append(
+                shapely.convex_hull(shapely.geometrycollections(parts))
             )
-            if not edges_gdf.empty:
-                geoms.extend(edges_gdf.geometry.buffer(edge_buffer_m).tolist())
-        if geoms:
-            coverage_polygons.append(unary_union(geoms).convex_hull)
 
-        if idx % 25 == 0 or idx == len(set(origin_nodes)):
-            print(f"  processed {idx}/{len(set(origin_nodes))} origin nodes")
+        if idx % 25 == 0 or idx == len(unique_origins):
+            # One flushed write per line keeps parallel workers' lines intact.
+            print(
+                f"  [{label}] processed {idx}/{len(unique_origins)} origin nodes\n",
+                end="",
+                flush=True,
+            )
 
     return unary_union(coverage_polygons) if coverage_polygons else None
 
 
-def save_geometry(geometry, crs, path: Path):
-    gdf = gpd.GeoDataFrame({"name": [path.stem]}, geometry=[geometry], crs=crs)
-    gdf.to_crs(ATLANTA_CRS).to_file(path, driver="GeoJSON")
+def save_geometry(geometry, transformer, path: Path):
+    geometry = shapely.transform(
+        geometry,
+        lambda xy: np.column_stack(transformer.transform(xy[:, 0], xy[:, 1])),
+    )
+    feature_collection = {
+        "type": "FeatureCollection",
+        "name": path.stem,
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {"name": path.stem},
+                "geometry": json.loads(shapely.to_geojson(geometry)),
+            }
+        ],
+    }
+    path.write_text(json.dumps(feature_collection))
 
 
 def parse_distances(args):
@@ -136,12 +203,11 @@ def parse_distances(args):
         values = [round(float(v.strip()), 1) for v in args.distances.split(",") if v.strip()]
         return sorted(set(values))
 
-    distances = []
-    current = args.distance_start
-    while current <= args.distance_end + 1e-9:
-        distances.append(round(current, 1))
-        current += args.distance_step
-    return sorted(set(distances))
+    count = int(
+        np.floor((args.distance_end - args.distance_start) / args.distance_step + 1e-9)
+    ) + 1
+    distances = args.distance_start + args.distance_step * np.arange(max(count, 0))
+    return sorted(set(np.round(distances, 1).tolist()))
 
 
 def parse_modes(args):
@@ -152,6 +218,55 @@ def parse_modes(args):
     return requested or list(NETWORK_CONFIG.keys())
 
 
+def init_worker(state):
+    WORKER_STATE.update(state)
+    # Prepared state does not survive pickling, so prepare in each worker.
+    shapely.prepare(WORKER_STATE["boundary_proj"])
+
+
+def compute_distance_layers(mode, distance_miles):
+    config = NETWORK_CONFIG[mode]
+    boundary_proj = WORKER_STATE["boundary_proj"]
+    origin_nodes = WORKER_STATE["origin_nodes"]
+    output_dir = WORKER_STATE["output_dir"]
+
+    print(
+        f"Computing {mode} service area polygons for {distance_miles:.1f} miles...\n",
+        end="",
+        flush=True,
+    )
+    coverage_geom = build_service_area(
+        WORKER_STATE["graph_proj"],
+        WORKER_STATE["graph_arrays"],
+        origin_nodes,
+        distance_miles * MILES_TO_METERS,
+        config["edge_buffer_m"],
+        config["node_buffer_m"],
+        f"{mode} {distance_miles:.1f}mi",
+    )
+    # The prepared boundary makes this containment test cheap; the clip
+    # itself is a full overlay and is skipped when it would be a no-op.
+    if not boundary_proj.contains(coverage_geom):
+        coverage_geom = coverage_geom.intersection(boundary_proj)
+    uncovered_geom = boundary_proj.difference(coverage_geom)
+
+    coverage_path = output_dir / f"{mode}_coverage_{distance_miles:.1f}mi.geojson"
+    uncovered_path = output_dir / f"{mode}_uncovered_{distance_miles:.1f}mi.geojson"
+    save_geometry(coverage_geom, WORKER_STATE["to_output_crs"], coverage_path)
+    save_geometry(uncovered_geom, WORKER_STATE["to_output_crs"], uncovered_path)
+
+    total_area = WORKER_STATE["boundary_area"]
+    covered_area = coverage_geom.area
+    return {
+        "coverage_path": str(coverage_path),
+        "uncovered_path": str(uncovered_path),
+        "unique_origin_nodes": int(len(set(origin_nodes))),
+        "covered_area_sq_m": float(covered_area),
+        "uncovered_area_sq_m": float(uncovered_geom.area),
+        "coverage_ratio": float(covered_area / total_area) if total_area else 0.0,
+    }
+
+
 def main():
     args = parse_args()
     csv_path = Path(args.csv)
@@ -172,7 +287,6 @@ def main():
     }
 
     for mode in modes:
-        config = NETWORK_CONFIG[mode]
         print(f"Building {mode} network...")
         graph = ox.graph_from_polygon(
             boundary_geom,
@@ -191,34 +305,38 @@ def main():
             X=providers_proj.geometry.x.tolist(),
             Y=providers_proj.geometry.y.tolist(),
         )
-
-        for distance_miles in distances:
-            print(f"Computing {mode} service area polygons for {distance_miles:.1f} miles...")
-            coverage_geom = build_service_area(
-                graph_proj,
-                origin_nodes,
-                distance_miles * MILES_TO_METERS,
-                config["edge_buffer_m"],
-                config["node_buffer_m"],
-            )
-            coverage_geom = coverage_geom.intersection(boundary_proj)
-            uncovered_geom = boundary_proj.difference(coverage_geom)
-
-            coverage_path = output_dir / f"{mode}_coverage_{distance_miles:.1f}mi.geojson"
-            uncovered_path = output_dir / f"{mode}_uncovered_{distance_miles:.1f}mi.geojson"
-            save_geometry(coverage_geom, graph_crs, coverage_path)
-            save_geometry(uncovered_geom, graph_crs, uncovered_path)
-
-            total_area = boundary_proj.area
-            covered_area = coverage_geom.area
-            summary["modes"][mode][f"{distance_miles:.1f}"] = {
-                "coverage_path": str(coverage_path),
-                "uncovered_path": str(uncovered_path),
-                "unique_origin_nodes": int(len(set(origin_nodes))),
-                "covered_area_sq_m": float(covered_area),
-                "uncovered_area_sq_m": float(uncovered_geom.area),
-                "coverage_ratio": float(covered_area / total_area) if total_area else 0.0,
-            }
+        graph_arrays = graph_geometry_arrays(graph_proj)
+
+        state = {
+            "graph_proj": graph_proj,
+            "graph_arrays": graph_arrays,
+            "to_output_crs": Transformer.from_crs(
+                graph_crs, ATLANTA_CRS, always_xy=True
+            ),
+            "boundary_proj": boundary_proj,
+            "boundary_area": boundary_proj.area,
+            "origin_nodes": origin_nodes,
+            "output_dir": output_dir,
+        }
+        workers = min(args.workers, len(distances))
+        if workers > 1:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=init_worker, initargs=(state,)
+            ) as executor:
+                futures = [
+                    executor.submit(compute_distance_layers, mode, distance_miles)
+                    for distance_miles in distances
+                ]
+                results = [future.result() for future in futures]
+        else:
+            init_worker(state)
+            results = [
+                compute_distance_layers(mode, distance_miles)
+                for distance_miles in distances
+            ]
+
+        for distance_miles, result in zip(distances, results):
+            summary["modes"][mode][f"{distance_miles:.1f}"] = result
 
     summary_path = output_dir / "network_coverage_summary.json"
     summary_path.write_text(json.dumps(summary, indent=2))